@@ -1,19 +1,18 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from app.services.ocr import get_image_data
-from app.services.ocr_llm import ocr_llm_process_receipt
+from app.services.ocr import get_image_bytes
+from app.services.ocr_llm import ocr_llm_process_receipt, receipt_processor
 from app.services.transaction_processor import process_transaction_screenshot
+from app.services.pipeline import ReceiptPipeline
 from app.services.database_service import DatabaseService
 from app.routes.auth import get_current_user
 from app.services.supabase_client import supabase
-from app.services.utils import json_serial, format_json_for_logging
+from app.services.utils import format_json_for_logging
 import logging
 import json
 from datetime import datetime, timedelta
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
 
-# json_serial function is now imported from utils.py - no duplicate definition needed
-
 router = APIRouter()
 db_service = DatabaseService()
 
@@ -40,10 +39,10 @@ async def analyze_expense_route(
         logging.info(f"Processing expense for user: {current_user['id']}")
         
         # Get the image data
-        image_data = await get_image_data(file)
+        image_data = await get_image_bytes(file)
         
         # Process the receipt using AI
-        processed_data = ocr_llm_process_receipt(image_data)
+        processed_data = await ocr_llm_process_receipt(image_data)
         logging.info(f"Processed receipt data: {format_json_for_logging(processed_data)}")
         
         # Store the transaction in database
@@ -82,6 +81,40 @@ async def analyze_expense_route(
             detail=f"Sorry, we couldn't process your receipt: {error_msg}"
         )
 
+@router.post("/analyze-expenses-batch")
+async def analyze_expenses_batch_route(
+    files: list[UploadFile] = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Analyze a batch of receipt images and return organized data for each.
+
+    Receipts flow through a three-stage pipeline (OCR -> LLM -> database)
+    so the stages overlap across receipts instead of running strictly
+    one receipt at a time.
+    """
+    try:
+        logging.info(f"Processing {len(files)} expenses for user: {current_user['id']}")
+
+        images = [await get_image_bytes(file) for file in files]
+
+        pipeline = ReceiptPipeline(receipt_processor, db_service, "receipt")
+        results = await pipeline.process_batch(
+            images,
+            user_id=current_user['id'],
+            access_token=current_user['access_token']
+        )
+
+        return {"results": results}
+
+    except Exception as e:
+        error_msg = str(e)
+        logging.error(f"Final error in analyze-expenses-batch: {error_msg}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Sorry, we couldn't process your receipts: {error_msg}"
+        )
+
 @router.post("/analyze-transaction")
 async def analyze_transaction_route(
     file: UploadFile = File(...),
@@ -100,11 +133,11 @@ async def analyze_transaction_route(
     """
     try:
         # Get the image data
-        image_data = await get_image_data(file)
+        image_data = await get_image_bytes(file)
         
         # Process the transaction screenshot
-        processed_data = process_transaction_screenshot(image_data)
-        print(f"Processed transaction data: {format_json_for_logging(processed_data)}")
+        processed_data = await process_transaction_screenshot(image_data)
+        logging.info(f"Processed transaction data: {format_json_for_logging(processed_data)}")
         
         # Store the transaction(s) in database
         if processed_data and 'parsed_data' in processed_data:
@@ -118,7 +151,7 @@ async def analyze_transaction_route(
                 if 'transaction_type' not in transaction_data:
                     transaction_data['transaction_type'] = 'sms'
                 
-                print(f"Storing transaction data: {format_json_for_logging(transaction_data)}")
+                logging.info(f"Storing transaction data: {format_json_for_logging(transaction_data)}")
                 
                 stored_transaction = await db_service.store_transaction(
                     user_id=current_user['id'],
@@ -127,18 +160,18 @@ async def analyze_transaction_route(
                 )
                 # Add the database ID to the response
                 processed_data['transaction_id'] = stored_transaction['id']
-                print(f"Successfully stored transaction: {format_json_for_logging(stored_transaction)}")
+                logging.info(f"Successfully stored transaction: {format_json_for_logging(stored_transaction)}")
             except ValueError as ve:
                 if "Profile not found" in str(ve):
-                    print(f"Profile not found error: {str(ve)}")
+                    logging.error(f"Profile not found error: {str(ve)}")
                     raise HTTPException(
                         status_code=404,
                         detail="User profile not found. Please ensure your account is properly set up."
                     )
-                print(f"Other ValueError in transaction storage: {str(ve)}")
+                logging.error(f"Other ValueError in transaction storage: {str(ve)}")
                 raise ve
             except Exception as e:
-                print(f"Unexpected error storing transaction: {str(e)}")
+                logging.error(f"Unexpected error storing transaction: {str(e)}")
                 raise
         
         return processed_data
@@ -147,7 +180,7 @@ async def analyze_transaction_route(
         # If something goes wrong, let the user know
         error_msg = str(e)
         status_code = 404 if "Profile not found" in error_msg else 500
-        print(f"Final error in analyze-transaction: {error_msg}")
+        logging.error(f"Final error in analyze-transaction: {error_msg}")
         raise HTTPException(
             status_code=status_code,
             detail=f"Sorry, we couldn't process your transaction: {error_msg}"
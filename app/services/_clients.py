@@ -0,0 +1,59 @@
+import os
+from functools import lru_cache
+
+import httpx
+from openai import AsyncOpenAI
+from paddleocr import PaddleOCR
+
+# One OpenAI client for the whole process - every module sharing it also
+# shares its connection pool, so requests reuse warm HTTPS connections
+# instead of paying a TLS handshake per call. HTTP/2 multiplexes the
+# concurrent completions from gather/pipeline batches over a single
+# connection, and the keep-alive expiry outlives gaps between uploads.
+# Async so awaited calls don't block the event loop.
+openai_client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    base_url="https://api.openai.com/v1",
+    http_client=httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=100,
+            max_keepalive_connections=50,
+            keepalive_expiry=60.0
+        ),
+        timeout=httpx.Timeout(30.0, connect=5.0)
+    )
+)
+
+
+# Angle classification runs an extra CNN per detected text box to fix
+# 180-degree rotations. Uploads have their EXIF orientation applied at
+# compression time, so it's ~15-25% of OCR latency (and ~10 MB of
+# weights) spent on a case that no longer occurs. ENABLE_ANGLE_CLS=1
+# turns it back on for deployments with genuinely rotated inputs.
+ENABLE_ANGLE_CLS = os.getenv("ENABLE_ANGLE_CLS", "0").lower() in ("1", "true", "yes")
+
+
+@lru_cache(maxsize=None)
+def get_ocr() -> PaddleOCR:
+    """Build the process-wide PaddleOCR engine on first use.
+
+    Loading the detection + recognition + angle-cls weights takes ~2 s
+    and a few hundred MiB, so the engine is created lazily - deploys on
+    the vision-LLM path (and tests/CLI tools that never OCR) skip the
+    cost entirely - and cached so it only ever happens once.
+
+    rec_batch_num/cls_batch_num default to 6, which makes Paddle's
+    native engine reserve workspace arenas it never needs here -
+    single-receipt images recognize a handful of lines at a time - so
+    batch size 1 cuts a few hundred MiB of RSS per worker. MKL-DNN
+    speeds up CPU inference on x86.
+    """
+    return PaddleOCR(
+        use_angle_cls=ENABLE_ANGLE_CLS,
+        lang='en',
+        rec_batch_num=1,
+        cls_batch_num=1,
+        det_limit_side_len=960,
+        enable_mkldnn=True
+    )
@@ -1,22 +1,41 @@
 from typing import Dict, List, Optional
-from pydantic import BaseModel
-from openai import OpenAI
-from paddleocr import PaddleOCR
+from pydantic import BaseModel, TypeAdapter, ValidationError
+import asyncio
 import base64
-import tempfile
+import hashlib
+import io
 import json
+import orjson
 import os
+import re
 import logging
+from rapidfuzz import fuzz
+from dateutil import parser as date_parser
+import cv2
+import numpy as np
+from PIL import Image
+from cachetools import LRUCache
 from datetime import datetime
 
-# Initialize OpenAI client
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    base_url="https://api.openai.com/v1"
-)
+from ._clients import openai_client, get_ocr, ENABLE_ANGLE_CLS
+from .ocr_pipeline import AsyncBatchQueue
+
+logger = logging.getLogger(__name__)
+
+# LLM calls run at temperature 0, so identical OCR text always yields the
+# same answer - cache parsed results by text hash to skip the round-trip
+# on duplicates and retries
+_llm_result_cache: LRUCache = LRUCache(maxsize=1024)
 
-# Initialize PaddleOCR
-ocr = PaddleOCR(use_angle_cls=True, lang='en')
+# Only include OCR text with good confidence; lower scores are mostly
+# noise that wastes LLM tokens downstream
+OCR_CONFIDENCE_THRESHOLD = 0.5
+
+# Send the receipt image straight to the vision LLM, fusing OCR and
+# interpretation into one call (saves the ~500 ms CPU-bound OCR stage).
+# Set USE_VISION_LLM=0 to keep the local OCR + text-LLM path, which
+# costs fewer input tokens for cost-sensitive deploys.
+USE_VISION_LLM = os.getenv("USE_VISION_LLM", "1").lower() not in ("0", "false", "no")
 
 # Common sectors for both processors - SINGLE SOURCE OF TRUTH
 SECTORS = [
@@ -37,6 +56,167 @@ SECTORS = [
     "Miscellaneous"
 ]
 
+# JSON schema enforced via OpenAI structured outputs. Mirrors
+# BaseTransactionData (transaction_type is filled in locally), with the
+# sector constrained to the known list so the model can't invent one.
+TRANSACTION_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "vendor": {"type": "string"},
+        "date": {"type": "string"},
+        "total": {"type": "number"},
+        "currency": {"type": "string"},
+        "sector": {"type": "string", "enum": SECTORS},
+        "uncertain_category": {"type": "boolean"}
+    },
+    "required": ["vendor", "date", "total", "currency", "sector", "uncertain_category"],
+    "additionalProperties": False
+}
+
+# Joined once at import - both prompt constants and get_sectors_string
+# share it instead of re-joining per call
+_SECTORS_STR = '", "'.join(SECTORS)
+
+# Static instruction prompts, built once at import. Keeping every
+# instruction in a fixed system message - with the variable OCR text
+# isolated in the user message - gives OpenAI's automatic prompt caching
+# a stable prefix to reuse across calls, cutting input-token cost and
+# latency on every receipt.
+RECEIPT_SYSTEM_PROMPT = f"""You are analyzing text extracted from a receipt image using OCR.
+
+Using ONLY information found in the provided text:
+- vendor: the primary retail brand or store name (prefer the main brand over parent companies), formatted for readability
+- date: any date found, converted to YYYY-MM-DD
+- total: the final total amount, typically marked 'Total', 'GROSS', or 'NET'
+- currency: the currency code; default to "BHD" if not found
+- sector: the best matching business sector, one of: "{_SECTORS_STR}"
+- uncertain_category: true if you're not confident about the sector classification"""
+
+TRANSACTION_SYSTEM_PROMPT = f"""You are analyzing text extracted from a bank transaction notification.
+
+Using ONLY information found in the provided text:
+- vendor: the merchant name, cleaned for readability (strip transaction codes, merchant IDs, asterisks; convert URL-style names like 'something.com' to 'Something'; use proper capitalization)
+- total: the transaction amount as a number
+- date: the transaction date, converted to YYYY-MM-DD
+- currency: the currency code; default to "BHD" if not found
+- sector: the best matching business sector, one of: "{_SECTORS_STR}"; use "Miscellaneous" if it can't be determined confidently
+- uncertain_category: true if you're not confident about the sector classification"""
+
+# Vision-path variants: the user message carries the image itself, not
+# OCR text, so the instructions describe reading the image directly
+VISION_RECEIPT_SYSTEM_PROMPT = f"""You are analyzing a photograph of a receipt.
+
+Using ONLY information visible in the provided image:
+- vendor: the primary retail brand or store name (prefer the main brand over parent companies), formatted for readability
+- date: any date found, converted to YYYY-MM-DD
+- total: the final total amount, typically marked 'Total', 'GROSS', or 'NET'
+- currency: the currency code; default to "BHD" if not found
+- sector: the best matching business sector, one of: "{_SECTORS_STR}"
+- uncertain_category: true if you're not confident about the sector classification"""
+
+VISION_TRANSACTION_SYSTEM_PROMPT = f"""You are analyzing a screenshot of a bank transaction notification.
+
+Using ONLY information visible in the provided image:
+- vendor: the merchant name, cleaned for readability (strip transaction codes, merchant IDs, asterisks; convert URL-style names like 'something.com' to 'Something'; use proper capitalization)
+- total: the transaction amount as a number
+- date: the transaction date, converted to YYYY-MM-DD
+- currency: the currency code; default to "BHD" if not found
+- sector: the best matching business sector, one of: "{_SECTORS_STR}"; use "Miscellaneous" if it can't be determined confidently
+- uncertain_category: true if you're not confident about the sector classification"""
+
+# Static request fragments, built once. The message dicts and the
+# response_format block never change, so rebuilding them per call only
+# churns allocations - the SDK serializes them by reference.
+_RECEIPT_SYSTEM_MESSAGE = {"role": "system", "content": RECEIPT_SYSTEM_PROMPT}
+_TRANSACTION_SYSTEM_MESSAGE = {"role": "system", "content": TRANSACTION_SYSTEM_PROMPT}
+_VISION_RECEIPT_SYSTEM_MESSAGE = {"role": "system", "content": VISION_RECEIPT_SYSTEM_PROMPT}
+_VISION_TRANSACTION_SYSTEM_MESSAGE = {"role": "system", "content": VISION_TRANSACTION_SYSTEM_PROMPT}
+_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "transaction",
+        "strict": True,
+        "schema": TRANSACTION_JSON_SCHEMA
+    }
+}
+
+# First stage of the LLM cascade: a vendor -> sector lookup table for
+# the vendors that dominate real usage. When the OCR text fuzzy-matches
+# a known vendor AND the total and date parse out with regexes, the
+# receipt never touches OpenAI at all - the cheapest classifier answers
+# first and the LLM is the fallback.
+_KNOWN_VENDORS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'known_vendors.json')
+try:
+    with open(_KNOWN_VENDORS_PATH, 'rb') as _f:
+        KNOWN_VENDORS: Dict[str, Dict] = orjson.loads(_f.read())
+except OSError:
+    KNOWN_VENDORS = {}
+
+# Similarity score (0-100) a vendor key must reach against a word
+# n-gram of the OCR text before the cascade trusts it
+KNOWN_VENDOR_SCORE_CUTOFF = 85
+
+# Keys shorter than this never fuzzy-match - 'zain' vs 'zainab' style
+# near-misses are too cheap at 3-4 characters, so short keys require an
+# exact token match
+_MIN_FUZZY_KEY_LEN = 5
+
+# OCR text tokens for vendor matching; keeps the characters vendor keys
+# use ("h&m", "mcdonald's", "x-cite")
+_WORD_RE = re.compile(r"[a-z0-9&'.\-]+")
+
+# "TOTAL 12.500" / "GROSS: BHD 4.20" style lines; receipts are
+# remarkably uniform here
+_TOTAL_RE = re.compile(
+    r'(?:total|gross|net|amount)\s*:?\s*(?:bhd|bd|usd|aed|sar|kwd|\$)?\s*(\d+[.,]\d{1,3})',
+    re.IGNORECASE
+)
+_DATE_RE = re.compile(r'\d{4}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}')
+_CURRENCY_RE = re.compile(r'\b(BHD|USD|AED|SAR|KWD|EUR|GBP)\b', re.IGNORECASE)
+
+def _image_cache_key(image_bytes: bytes, prompt_type: str) -> str:
+    """Result-cache key for a raw image - same image, same answer."""
+    return hashlib.blake2b(
+        f"{prompt_type}|".encode() + image_bytes, digest_size=16
+    ).hexdigest()
+
+def _cached_result_copy(cached: Dict) -> Dict:
+    """Shallow-copy a cached result so callers mutating it don't poison the cache."""
+    return {
+        "parsed_data": dict(cached["parsed_data"]),
+        "raw_data": dict(cached["raw_data"])
+    }
+
+# Cap logged payload sizes - a malformed multi-KB response logged whole
+# by several concurrent failures serializes large stdout writes for no
+# diagnostic benefit
+_LOG_SNIPPET_LEN = 200
+
+def _snippet(text) -> str:
+    """Truncate a payload for logging, keeping the original length visible."""
+    text = str(text)
+    if len(text) <= _LOG_SNIPPET_LEN:
+        return text
+    return f"{text[:_LOG_SNIPPET_LEN]}... ({len(text)} chars)"
+
+def _parse_llm_json(result: str) -> Dict:
+    """Parse an LLM response expected to hold one JSON object.
+
+    orjson handles the normal case in one pass. If the model wrapped the
+    object in stray text or emitted several concatenated objects (it
+    happens without strict schema enforcement, e.g. on the fallback
+    paths), scan with raw_decode and take the first object instead of
+    failing outright.
+    """
+    try:
+        return orjson.loads(result)
+    except json.JSONDecodeError:
+        stripped = result[result.find('{'):].lstrip()
+        if not stripped:
+            raise
+        obj, _ = json.JSONDecoder().raw_decode(stripped)
+        return obj
+
 class BaseTransactionData(BaseModel):
     """Base model for transaction data that both processors will use."""
     vendor: str      # Store/merchant name
@@ -44,195 +224,388 @@ class BaseTransactionData(BaseModel):
     date: str        # Transaction date
     sector: str      # Business sector
     currency: str    # Transaction currency
-    transaction_type: str  # Type of transaction
+    transaction_type: str = ""  # Type of transaction (filled locally per prompt type)
     uncertain_category: bool = False   # Flag for uncertain categorization
 
+# Schema-bound adapter: parses and validates the LLM's JSON in a single
+# pydantic-core (Rust) pass, with no intermediate dict
+_TRANSACTION_ADAPTER = TypeAdapter(BaseTransactionData)
+
 class BaseProcessor:
     """Base class for both receipt and transaction processors."""
-    
+
+    # One queue - and therefore one drain worker - for the whole
+    # process. Paddle's inference predictors are not thread-safe, so
+    # every OCR call must funnel through the same worker no matter
+    # which processor instance (or the batch pipeline) initiated it;
+    # per-instance queues would drive the shared engine from several
+    # threads at once.
+    _ocr_queue: Optional[AsyncBatchQueue] = None
+
     def __init__(self):
-        self.ocr = ocr
-        self.client = client
+        self.client = openai_client
+        # Coalesces concurrent single-image requests into batched OCR
+        # calls - see ocr_pipeline.AsyncBatchQueue
+        if BaseProcessor._ocr_queue is None:
+            BaseProcessor._ocr_queue = AsyncBatchQueue(self.extract_texts_from_bytes)
+
+    @property
+    def ocr(self):
+        """The shared PaddleOCR engine, loaded lazily on first OCR call."""
+        return get_ocr()
     
-    def extract_text_with_ocr(self, image_path: str) -> str:
-        """Extract text from image using PaddleOCR."""
-        result = self.ocr.ocr(image_path, cls=True)
-        
-        extracted_text = []
-        for line in result:
-            for item in line:
-                text = item[1][0]  # Get the text
-                confidence = item[1][1]  # Get confidence score
-                if confidence > 0.5:  # Only include text with good confidence
-                    extracted_text.append(text)
-        
-        return "\n".join(extracted_text)
+    def _collect_ocr_text(self, result) -> str:
+        """Collect confident text lines from a single image's OCR result."""
+        # item[1] is a (text, confidence) pair; a single flattened
+        # comprehension keeps the per-box filtering tight. PaddleOCR
+        # returns None (or [None]) for images with no detected text, so
+        # guard both levels instead of crashing on empty images.
+        return "\n".join(
+            item[1][0]
+            for line in (result or ())
+            for item in (line or ())
+            if item[1][1] > OCR_CONFIDENCE_THRESHOLD
+        )
+
+    def extract_text_with_ocr(self, image) -> str:
+        """Extract text from an image (file path or ndarray) using PaddleOCR."""
+        result = self.ocr.ocr(image, cls=ENABLE_ANGLE_CLS)
+        return self._collect_ocr_text(result)
+
+    def extract_text_with_ocr_batch(self, images: List) -> List[str]:
+        """Extract text from several images in one threaded call.
+
+        PaddleOCR 2.x only accepts a list input when detection is
+        disabled (it exits otherwise), so detection runs per image here.
+        The batching win is amortizing the thread hop and queue overhead
+        across the group, not a Paddle-level batched predict.
+        """
+        return [self.extract_text_with_ocr(image) for image in images]
+
+    def _decode_image_bytes(self, image_bytes: bytes) -> np.ndarray:
+        """Decode raw image bytes straight to an ndarray - no disk round-trip.
+
+        cv2.imdecode goes directly from the JPEG buffer to the BGR array
+        PaddleOCR consumes internally, skipping PIL's intermediate image
+        object and an RGB->BGR conversion inside Paddle's preprocessing.
+        """
+        img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            # Formats OpenCV can't decode (rare after upload-side JPEG
+            # re-encoding) fall back to PIL. The channel flip to BGR
+            # makes a negative-stride view, which cv2 routines inside
+            # Paddle's preprocessing reject - copy it contiguous.
+            with Image.open(io.BytesIO(image_bytes)) as pil_img:
+                img = np.ascontiguousarray(np.asarray(pil_img.convert('RGB'))[:, :, ::-1])
+        return img
     
     def get_sectors_string(self) -> str:
         """Get sectors as a formatted string for prompts."""
-        return '", "'.join(SECTORS)
+        return _SECTORS_STR
     
-    def create_processing_prompt(self, extracted_text: str, prompt_type: str) -> str:
-        """Create a prompt for the AI based on the type of document."""
-        sectors_str = self.get_sectors_string()
-        
+    def create_system_prompt(self, prompt_type: str) -> str:
+        """Pick the static system prompt for the document type.
+
+        All instructions (and the sector list) live in these fixed
+        module-level constants so OpenAI prompt caching can reuse the
+        prefix; the OCR text goes in the user message alone.
+        """
         if prompt_type == "receipt":
-            return f"""
-Analyze the following text extracted from a receipt image using OCR:
-
-{extracted_text}
-
-Extract these key details from the provided text ONLY:
-1. Vendor/Store name: Identify the primary retail brand or store name by:
-   - Prioritizing main brand names over parent companies or subsidiaries
-   - Checking receipt header, product names, and store identifiers
-   - Formatting for readability (proper case, remove unnecessary text)
-
-2. Date: Find any date in the text and convert it to YYYY-MM-DD format
-3. Total amount: Identify the final total amount, typically found with indicators like 'Total', 'GROSS', 'NET'
-4. Currency: Identify the currency code (e.g., BHD, USD). If not found, default to BHD
-5. Business sector: Classify the business into exactly one of these categories:
-"{sectors_str}"
-
-6. Uncertain category: Set to true if you're not confident about the sector classification
-
-Respond with ONLY valid JSON in this structure:
-{{
-    "vendor": "business_name",
-    "date": "YYYY-MM-DD",
-    "total": number,
-    "currency": "currency_code",
-    "sector": "matching_category",
-    "uncertain_category": boolean
-}}
-
-Use ONLY information found in the provided OCR text. If currency is not found, default to "BHD"."""
-        else:  # transaction/sms
-            return f"""
-Analyze the following text extracted from a bank transaction notification:
-
-{extracted_text}
-
-Extract these key details:
-1. Vendor/Merchant name: Carefully analyze the text to find the business name. It might be:
-   - In a website URL (e.g., 'something.com' -> 'Something')
-   - Part of a longer string with extra characters
-   - Mixed with transaction codes or IDs
-   - Using asterisks or special characters (e.g., 'STORE*NAME' -> 'Store Name')
-   Make the final name as readable as possible by:
-   - Removing special characters, transaction codes, and unnecessary spaces
-   - Converting URL-style names to proper business names
-   - Using proper capitalization
-   - Making abbreviations more readable if their meaning is clear
-   - Removing location codes or merchant IDs (e.g., numbers after the name)
-
-2. Total amount (as a number)
-3. Date of transaction (convert to YYYY-MM-DD format)
-4. Currency (e.g., BHD, USD). If not found, default to BHD
-5. Business sector (MUST be one of: "{sectors_str}")
-6. Uncertain category: Set to true if you're not confident about the sector classification
-
-If you're unsure about the business sector for a vendor, you should:
-1. Set uncertain_category to true
-2. Make an educated guess based on the vendor name and transaction details
-3. If you can't determine the sector confidently, use "Miscellaneous"
-
-Respond with ONLY valid JSON in this structure:
-{{
-    "vendor": "merchant_name",
-    "total": amount_as_number,
-    "date": "YYYY-MM-DD",
-    "currency": "currency_code",
-    "sector": "one of the predefined categories",
-    "uncertain_category": boolean
-}}
-
-Do not include any text outside the JSON. Use ONLY information found in the provided text. If currency is not found, default to "BHD"."""
+            return RECEIPT_SYSTEM_PROMPT
+        return TRANSACTION_SYSTEM_PROMPT
     
-    def process_image(self, base64_image: str, prompt_type: str) -> Dict:
+    def _match_known_vendor_key(self, extracted_text: str) -> Optional[str]:
+        """Find a known-vendor key on token boundaries in the OCR text.
+
+        Candidates are word n-grams of the same length as each key, so a
+        key can never score against a substring of an unrelated word
+        ('ewa' in 'Safeway', 'stc' in 'Costco'). Keys below the fuzzy
+        length floor must match their n-gram exactly - short keys are
+        one typo away from everything.
+        """
+        words = _WORD_RE.findall(extracted_text.lower())
+        if not words:
+            return None
+        best_key = None
+        best_score = 0.0
+        for key in KNOWN_VENDORS:
+            key_len = len(key.split())
+            for start in range(len(words) - key_len + 1):
+                phrase = ' '.join(words[start:start + key_len])
+                if phrase == key:
+                    score = 100.0
+                elif len(key) >= _MIN_FUZZY_KEY_LEN:
+                    score = fuzz.ratio(phrase, key)
+                else:
+                    continue
+                if score >= KNOWN_VENDOR_SCORE_CUTOFF and score > best_score:
+                    best_key = key
+                    best_score = score
+        return best_key
+
+    def match_known_vendor(self, extracted_text: str, prompt_type: str) -> Optional[Dict]:
+        """Try to answer from the known-vendor table without the LLM.
+
+        Returns a result in the same shape as analyze_text when the OCR
+        text matches a known vendor on word boundaries and the total and
+        date parse out cleanly; None means fall through to the LLM.
+        """
+        if not KNOWN_VENDORS or not extracted_text:
+            return None
+        matched_key = self._match_known_vendor_key(extracted_text)
+        if matched_key is None:
+            return None
+
+        # Only skip the LLM when the structured fields also parse; a
+        # vendor hit alone isn't worth a wrong total
+        total_match = _TOTAL_RE.search(extracted_text)
+        date_match = _DATE_RE.search(extracted_text)
+        if total_match is None or date_match is None:
+            return None
+        try:
+            date_iso = date_parser.parse(date_match.group(), dayfirst=True).date().isoformat()
+        except (ValueError, OverflowError):
+            return None
+
+        currency_match = _CURRENCY_RE.search(extracted_text)
+        vendor = KNOWN_VENDORS[matched_key]
+        return {
+            "parsed_data": {
+                "vendor": vendor["name"],
+                "total": float(total_match.group(1).replace(',', '.')),
+                "date": date_iso,
+                "sector": vendor["sector"],
+                "currency": currency_match.group(1).upper() if currency_match else "BHD",
+                "transaction_type": prompt_type,
+                "uncertain_category": False
+            },
+            "raw_data": {
+                "ocr_text": extracted_text,
+                "llm_response": None
+            }
+        }
+
+    async def analyze_text(self, extracted_text: str, prompt_type: str) -> Dict:
+        """
+        Analyze already-extracted document text with the LLM.
+
+        Args:
+            extracted_text: Text extracted from the document via OCR
+            prompt_type: Type of document ("receipt" or "transaction")
+
+        Returns:
+            Dict containing both parsed data and raw outputs
+
+        Raises:
+            ValueError: If the LLM response cannot be parsed or validated
+        """
+        # Cascade stage 1: a known vendor plus parseable total and date
+        # answers locally, skipping the API call entirely
+        shortcut = self.match_known_vendor(extracted_text, prompt_type)
+        if shortcut is not None:
+            logger.debug(f"Known-vendor match: {shortcut['parsed_data']['vendor']} - skipping LLM")
+            return shortcut
+
+        # Deterministic at temperature 0: identical text means an identical
+        # answer, so duplicates and retries skip the API entirely
+        cache_key = hashlib.blake2b(
+            f"{prompt_type}|{extracted_text}".encode(), digest_size=16
+        ).hexdigest()
+        system_message = (
+            _RECEIPT_SYSTEM_MESSAGE if prompt_type == "receipt"
+            else _TRANSACTION_SYSTEM_MESSAGE
+        )
+        return await self._complete_and_parse(
+            user_content=extracted_text,
+            system_message=system_message,
+            prompt_type=prompt_type,
+            cache_key=cache_key,
+            source_text=extracted_text,
+        )
+
+    async def analyze_image(self, image_bytes: bytes, prompt_type: str) -> Dict:
+        """
+        Analyze a document image directly with the vision LLM - no OCR stage.
+
+        gpt-4o-mini is natively multimodal, so sending the (already
+        JPEG-compressed, <=1024 px) image as a low-detail content part
+        fuses text extraction and interpretation into one API call.
+
+        Args:
+            image_bytes: Raw (JPEG-compressed) image data
+            prompt_type: Type of document ("receipt" or "transaction")
+
+        Returns:
+            Dict containing both parsed data and raw outputs
+
+        Raises:
+            ValueError: If the LLM response cannot be parsed or validated
+        """
+        cache_key = _image_cache_key(image_bytes, prompt_type)
+        user_content = [{
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:image/jpeg;base64,{base64.b64encode(image_bytes).decode()}",
+                # Receipts are small; low detail keeps the image at ~85
+                # input tokens
+                "detail": "low"
+            }
+        }]
+        system_message = (
+            _VISION_RECEIPT_SYSTEM_MESSAGE if prompt_type == "receipt"
+            else _VISION_TRANSACTION_SYSTEM_MESSAGE
+        )
+        return await self._complete_and_parse(
+            user_content=user_content,
+            system_message=system_message,
+            prompt_type=prompt_type,
+            cache_key=cache_key,
+            source_text=None,
+        )
+
+    async def _complete_and_parse(self, user_content, system_message: Dict,
+                                  prompt_type: str, cache_key: str,
+                                  source_text: Optional[str]) -> Dict:
+        """Shared completion + parse + cache path for the text and vision routes."""
+        cached = _llm_result_cache.get(cache_key)
+        if cached is not None:
+            return _cached_result_copy(cached)
+
+        # Process with LLM - static instructions as the system message,
+        # only the per-document content varies per call
+        response = await self.client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                system_message,
+                {
+                    "role": "user",
+                    "content": user_content
+                }
+            ],
+            temperature=0,
+            response_format=_RESPONSE_FORMAT,
+            # Stream tokens as they are generated instead of waiting for
+            # the full completion - the response is accumulated locally,
+            # which overlaps network transfer with generation and trims
+            # wall-clock latency without changing the return shape
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+
+        # Accumulate the streamed response
+        chunks = []
+        usage = None
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                chunks.append(chunk.choices[0].delta.content)
+            if chunk.usage is not None:
+                usage = chunk.usage
+        result = "".join(chunks).strip()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Raw LLM response: {_snippet(result)}")
+
+        # Track how much of the prompt the API served from cache, so the
+        # static-prefix layout can be verified in the logs
+        details = getattr(usage, "prompt_tokens_details", None)
+        if details is not None:
+            logger.debug(f"Prompt tokens: {usage.prompt_tokens} ({getattr(details, 'cached_tokens', 0)} cached)")
+
+        # Parse and validate the response. The TypeAdapter fuses both
+        # into one pydantic-core pass straight off the response string -
+        # no intermediate dict. The scanner path only runs when the
+        # response isn't the clean schema-enforced object.
+        try:
+            try:
+                transaction_data = _TRANSACTION_ADAPTER.validate_json(result)
+            except ValidationError:
+                parsed_result = _parse_llm_json(result)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Parsed JSON: {_snippet(parsed_result)}")
+                transaction_data = _TRANSACTION_ADAPTER.validate_python(parsed_result)
+
+            # transaction_type is filled locally, not by the LLM
+            if not transaction_data.transaction_type:
+                transaction_data.transaction_type = prompt_type
+
+            # Return both the structured data and raw outputs
+            analyzed = {
+                "parsed_data": transaction_data.model_dump(mode='python'),
+                "raw_data": {
+                    "ocr_text": source_text,
+                    "llm_response": result
+                }
+            }
+            _llm_result_cache[cache_key] = {
+                "parsed_data": dict(analyzed["parsed_data"]),
+                "raw_data": dict(analyzed["raw_data"])
+            }
+            return analyzed
+
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON parse error: {str(e)} - response: {_snippet(result)}")
+            raise ValueError(f"Failed to parse LLM response as JSON: {_snippet(result)}")
+        except Exception as e:
+            logger.error(f"Validation error: {str(e)}")
+            raise ValueError(f"Invalid transaction data format: {str(e)}")
+
+    async def analyze_texts(self, extracted_texts: List[str], prompt_type: str) -> List[Dict]:
+        """Analyze several extracted texts concurrently - total latency is
+        one LLM round-trip instead of one per document."""
+        return await asyncio.gather(
+            *(self.analyze_text(extracted_text, prompt_type) for extracted_text in extracted_texts)
+        )
+
+    def extract_text_from_bytes(self, image_bytes: bytes) -> str:
+        """Decode raw image bytes and extract their text with OCR."""
+        return self.extract_text_with_ocr(self._decode_image_bytes(image_bytes))
+
+    def extract_texts_from_bytes(self, images: List[bytes]) -> List[str]:
+        """Decode several images and extract their text in one batched OCR call."""
+        return self.extract_text_with_ocr_batch(
+            [self._decode_image_bytes(image_bytes) for image_bytes in images]
+        )
+
+    async def process_image(self, image_bytes: bytes, prompt_type: str) -> Dict:
         """
         Process an image using OCR and LLM analysis.
-        
+
         Args:
-            base64_image: Base64 encoded image data
+            image_bytes: Raw (JPEG-compressed) image data
             prompt_type: Type of document ("receipt" or "transaction")
-            
+
         Returns:
             Dict containing both parsed data and raw outputs
-            
+
         Raises:
             ValueError: If processing fails
         """
         try:
-            # Convert base64 to image file
-            image_data = base64.b64decode(base64_image)
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-                temp_file.write(image_data)
-                temp_file_path = temp_file.name
+            if USE_VISION_LLM:
+                # Fused path: the vision LLM reads the image itself,
+                # skipping the CPU-bound OCR stage entirely. Results are
+                # cached on the image hash inside analyze_image.
+                return await self.analyze_image(image_bytes, prompt_type)
+
+            # A duplicate upload (retry storms, double submits, test
+            # fixtures) hits the result cache on the raw image bytes and
+            # skips OCR and the LLM alike
+            image_key = _image_cache_key(image_bytes, prompt_type)
+            cached = _llm_result_cache.get(image_key)
+            if cached is not None:
+                return _cached_result_copy(cached)
+
+            # Extract text using OCR. The batch queue runs the CPU-bound
+            # work off the event loop and merges concurrent requests into
+            # one batched PaddleOCR call.
+            extracted_text = await self._ocr_queue.submit(image_bytes)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Extracted text: {_snippet(extracted_text)}")
+
+            # Analyze the extracted text with the LLM
+            analyzed = await self.analyze_text(extracted_text, prompt_type)
+            _llm_result_cache[image_key] = _cached_result_copy(analyzed)
+            return analyzed
 
-            try:
-                # Extract text using OCR
-                extracted_text = self.extract_text_with_ocr(temp_file_path)
-                print("\nExtracted Text:", extracted_text)
-                
-                # Create instructions for the AI
-                prompt = self.create_processing_prompt(extracted_text, prompt_type)
-                
-                # Process with LLM
-                response = self.client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are analyzing document text. Respond with ONLY valid JSON."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    temperature=0,
-                    response_format={"type": "json_object"}
-                )
-                
-                # Get the response
-                result = response.choices[0].message.content.strip()
-                print("\nRaw LLM Response:", result)
-                
-                # Parse and validate the response
-                try:
-                    parsed_result = json.loads(result)
-                    print("\nParsed JSON:", parsed_result)
-                    
-                    # Ensure transaction_type is present
-                    if "transaction_type" not in parsed_result:
-                        parsed_result["transaction_type"] = prompt_type
-
-                    # Validate against BaseTransactionData model
-                    transaction_data = BaseTransactionData(**parsed_result)
-                    
-                    # Return both the structured data and raw outputs
-                    return {
-                        "parsed_data": transaction_data.dict(),
-                        "raw_data": {
-                            "ocr_text": extracted_text,
-                            "llm_response": result
-                        }
-                    }
-                    
-                except json.JSONDecodeError as e:
-                    print(f"\nJSON Parse Error: {str(e)}")
-                    print(f"Raw response that failed to parse: {result}")
-                    raise ValueError(f"Failed to parse LLM response as JSON: {result}")
-                except Exception as e:
-                    print(f"\nValidation Error: {str(e)}")
-                    raise ValueError(f"Invalid transaction data format: {str(e)}")
-                
-            finally:
-                # Clean up temporary file
-                if os.path.exists(temp_file_path):
-                    os.remove(temp_file_path)
-                    
         except Exception as e:
-            print(f"\nGeneral Error: {str(e)}")
-            raise ValueError(f"Failed to process document: {str(e)}") 
\ No newline at end of file
+            logger.error(f"Failed to process document: {str(e)}")
+            raise ValueError(f"Failed to process document: {str(e)}")
@@ -1,85 +1,261 @@
 from typing import Dict, List, Optional, Tuple, Union, Any
+import asyncio
 import os
-from openai import OpenAI
-from thefuzz import fuzz
+from rapidfuzz import fuzz, process
 from functools import lru_cache
+import hashlib
 import re
-from datetime import datetime
+import string
+from datetime import datetime, timezone
 import json
 import logging
-from .supabase_client import supabase
-from .utils import json_serial, format_json_for_logging
+import orjson
+from cachetools import LRUCache
 
-# Initialize OpenAI client
-openai_client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    base_url="https://api.openai.com/v1"
-)
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
 
-# json_serial function is now imported from utils.py - no duplicate definition needed
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+from postgrest import SyncPostgrestClient
+
+from ._clients import openai_client
+from .supabase_client import supabase_url, supabase_key
+from .utils import format_json_for_logging
+
+logger = logging.getLogger(__name__)
+
+# Per-token PostgREST clients. Calling auth() on the shared supabase
+# client mutates global state, and with queries running in worker
+# threads after awaits, a concurrent request could swap the token
+# between the set and the query - executing under the wrong user's
+# credentials. Each access token gets its own client instead; the cache
+# is bounded and keeps the underlying keep-alive connections warm across
+# a user's requests.
+_postgrest_clients: LRUCache = LRUCache(maxsize=128)
+
+def _authed_postgrest(access_token: str) -> SyncPostgrestClient:
+    """Get (or build) a PostgREST client authenticated as one user."""
+    client = _postgrest_clients.get(access_token)
+    if client is None:
+        client = SyncPostgrestClient(
+            f"{supabase_url}/rest/v1",
+            headers={
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+                "apikey": supabase_key,
+                "Authorization": f"Bearer {access_token}",
+            },
+        )
+        _postgrest_clients[access_token] = client
+    return client
+
+# Keep OpenAI verification verdicts for 30 days
+SIMILARITY_CACHE_TTL = 2_592_000
+
+# Bounded in-process verification cache, shared across VendorMatcher
+# instances and used as the fallback layer when Redis is not configured.
+# Keys are already symmetric (sorted normalized pair).
+_verification_cache: LRUCache = LRUCache(maxsize=10_000)
+
+# Local embedding model for vendor verification - a ~2 ms cosine check on
+# CPU instead of a ~500 ms OpenAI round-trip. Loaded lazily on first use;
+# OpenAI remains the fallback when sentence-transformers isn't installed.
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_SIMILARITY_THRESHOLD = 0.75
+
+# Inference backend for the embedding model. Set EMBEDDING_BACKEND=onnx
+# (requires the optimum + onnxruntime extras) to run an int8-quantized
+# export - roughly 2-4x faster on CPUs with VNNI than the fp32 torch
+# path. EMBEDDING_MODEL_FILE selects a specific ONNX file inside the
+# model repo, e.g. a quantized 'model_qint8_avx512_vnni.onnx'.
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+EMBEDDING_MODEL_FILE = os.getenv('EMBEDDING_MODEL_FILE')
+
+_embedding_model = None
+
+# Set once a load attempt fails, so an offline host (no HF cache to
+# download into) degrades to OpenAI verification instead of retrying
+# the download on every borderline match
+_embedding_model_failed = False
+
+def _get_embedding_model():
+    """Lazily load the sentence-transformers model, if available."""
+    global _embedding_model, _embedding_model_failed
+    if _embedding_model is not None or _embedding_model_failed or SentenceTransformer is None:
+        return _embedding_model
+    model_kwargs = {}
+    if EMBEDDING_BACKEND != 'torch' and EMBEDDING_MODEL_FILE:
+        model_kwargs['file_name'] = EMBEDDING_MODEL_FILE
+    try:
+        _embedding_model = SentenceTransformer(
+            EMBEDDING_MODEL_NAME,
+            backend=EMBEDDING_BACKEND,
+            model_kwargs=model_kwargs,
+        )
+    except Exception as e:
+        if EMBEDDING_BACKEND != 'torch':
+            # A missing onnxruntime/optimum install or model file shouldn't
+            # take vendor matching down - fall back to the torch backend
+            logger.warning(f"Embedding backend '{EMBEDDING_BACKEND}' unavailable ({e}), using torch")
+            try:
+                _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+                return _embedding_model
+            except Exception as torch_error:
+                e = torch_error
+        # Any load failure degrades to the OpenAI verification path;
+        # vendor matching must not fail the receipt over a local
+        # optimization
+        logger.warning(f"Local embedding model unavailable ({e}), using OpenAI verification")
+        _embedding_model_failed = True
+    return _embedding_model
+
+# Candidates whose token sets overlap less than this never reach full
+# fuzzy scoring - cheap set ops prune the obvious non-matches first
+JACCARD_PREFILTER_THRESHOLD = 0.3
+
+# Only this many top-scoring candidates get the full weighted score;
+# the rest are ranked by the vectorized token_set_ratio alone
+TOP_K_FULL_SCORE = 5
+
+# Strips punctuation in C - built once, normalize_vendor_name runs for
+# every vendor pair
+_PUNCT_TBL = str.maketrans('', '', string.punctuation)
+
+# Common words that don't affect matching
+_STOP_WORDS = frozenset({'the', 'and', 'or', 'ltd', 'limited', 'inc', 'incorporated'})
+
+def _utc_now_iso() -> str:
+    """Current UTC time as an ISO-8601 string for created_at columns.
+
+    datetime.utcnow() is deprecated in 3.12; this is the timezone-aware
+    replacement, kept in one place so insert paths share it.
+    """
+    return datetime.now(timezone.utc).isoformat()
+
+@lru_cache(maxsize=None)
+def _normalize_vendor_name(vendor: str) -> str:
+    """Normalize a vendor name for comparison (module-level so the cache
+    isn't tied to a VendorMatcher instance)."""
+    # Remove special characters and extra spaces
+    normalized = vendor.lower().translate(_PUNCT_TBL).strip()
+    # Remove common words that don't affect matching
+    return ' '.join(word for word in normalized.split() if word not in _STOP_WORDS)
 
 class VendorMatcher:
     def __init__(self):
-        self.similarity_cache = {}
-    
-    @lru_cache(maxsize=1000)
+        # Exact-match indexes over prepared vendors: normalized name and
+        # word-set keys short-circuit the fuzzy scoring entirely for the
+        # common "same vendor again" case
+        self._norm_index: Dict[str, Dict] = {}
+        self._words_index: Dict[frozenset, Dict] = {}
+        # Inverted index word -> vendors containing it, used to narrow the
+        # fuzzy-scoring sweep to vendors sharing at least one word
+        self._word_index: Dict[str, List[Dict]] = {}
+        redis_url = os.getenv("REDIS_URL")
+        if redis_asyncio and redis_url:
+            self._redis = redis_asyncio.from_url(redis_url)
+        else:
+            self._redis = None
+
+    def _similarity_cache_key(self, vendor_a: str, vendor_b: str) -> str:
+        """Build a cache key that is stable across vendor argument order."""
+        norm_a = self.normalize_vendor_name(vendor_a)
+        norm_b = self.normalize_vendor_name(vendor_b)
+        digest = hashlib.sha1(b"|".join(sorted([norm_a.encode(), norm_b.encode()]))).hexdigest()
+        return f"vmatch:{digest}"
+
+    async def _get_cached_verification(self, cache_key: str) -> Optional[bool]:
+        """Look up a cached OpenAI verification result (Redis first, then local)."""
+        if self._redis is not None:
+            try:
+                value = await self._redis.get(cache_key)
+                if value is not None:
+                    return value == b'1'
+            except Exception as e:
+                logger.warning(f"Redis cache read failed: {str(e)}")
+        return _verification_cache.get(cache_key)
+
+    async def _set_cached_verification(self, cache_key: str, is_similar: bool) -> None:
+        """Store an OpenAI verification result in Redis and the local fallback."""
+        _verification_cache[cache_key] = is_similar
+        if self._redis is not None:
+            try:
+                await self._redis.set(cache_key, b'1' if is_similar else b'0', ex=SIMILARITY_CACHE_TTL)
+            except Exception as e:
+                logger.warning(f"Redis cache write failed: {str(e)}")
+
     def normalize_vendor_name(self, vendor: str) -> str:
         """Normalize vendor name for initial comparison."""
-        # Remove special characters and extra spaces
-        normalized = re.sub(r'[^\w\s]', '', vendor.lower().strip())
-        # Remove common words that don't affect matching
-        stop_words = {'the', 'and', 'or', 'ltd', 'limited', 'inc', 'incorporated'}
-        result = ' '.join(word for word in normalized.split() if word not in stop_words)
-        print(f"Normalized vendor name '{vendor}' to '{result}'")
-        return result
+        return _normalize_vendor_name(vendor)
+
+    def prepare_vendors(self, existing_vendors: List[Dict]) -> None:
+        """Attach precomputed normalized forms to vendor records in place.
+
+        Idempotent - records that already carry '_norm'/'_words' are left
+        untouched, so this is cheap to call on a cached vendor list.
+        """
+        for vendor in existing_vendors:
+            if '_norm' not in vendor:
+                vendor['_norm'] = _normalize_vendor_name(vendor['name'])
+                vendor['_words'] = frozenset(vendor['_norm'].split())
+            if vendor['_norm']:
+                if vendor['_norm'] not in self._norm_index:
+                    self._norm_index[vendor['_norm']] = vendor
+                    for word in vendor['_words']:
+                        self._word_index.setdefault(word, []).append(vendor)
+                self._words_index.setdefault(vendor['_words'], vendor)
     
-    def calculate_similarity_score(self, new_vendor: str, existing_vendor: str) -> float:
-        """Calculate similarity score using multiple methods."""
-        # Normalize both names
-        norm_new = self.normalize_vendor_name(new_vendor)
-        norm_existing = self.normalize_vendor_name(existing_vendor)
-        
-        # Get individual words
-        new_words = set(norm_new.split())
-        existing_words = set(norm_existing.split())
-        
-        # Calculate similarity scores - only keep the most useful ones
-        token_set_ratio = fuzz.token_set_ratio(norm_new, norm_existing)
-        
+    def _weighted_score(self, token_set_ratio: float, new_words: frozenset, existing_words: frozenset) -> float:
+        """Combine a precomputed token_set_ratio with the word-overlap and store-variation signals."""
         # Calculate word overlap
         common_words = new_words.intersection(existing_words)
-        word_overlap = len(common_words) / max(len(new_words), len(existing_words)) * 100
-        
+        word_overlap = len(common_words) / max(len(new_words), len(existing_words), 1) * 100
+
         # Check for common store name patterns
         is_store_variation = False
         store_types = {'market', 'hypermarket', 'supermarket', 'store', 'shop', 'mart'}
         new_words_no_type = new_words - store_types
         existing_words_no_type = existing_words - store_types
-        
+
         # If the core names match after removing store types, it's likely a variation
         if new_words_no_type == existing_words_no_type and new_words_no_type:
             is_store_variation = True
-        
+
         # Calculate final score with optimized weights
-        final_score = (
+        return (
             token_set_ratio * 0.40 +      # Word order independent similarity (increased)
             word_overlap * 0.40 +         # Word overlap (increased)
             (100 if is_store_variation else 0) * 0.20  # Store variation bonus (increased)
         )
-        
-        print(f"\nSimilarity scores for '{new_vendor}' vs '{existing_vendor}':")
-        print(f"Token set ratio: {token_set_ratio}%")
-        print(f"Word overlap: {word_overlap}%")
-        print(f"Is store variation: {is_store_variation}")
-        print(f"Final score: {final_score}%")
-        
+
+    def calculate_similarity_score(self, new_vendor: str, existing_vendor: str) -> float:
+        """Calculate similarity score using multiple methods."""
+        # Normalize both names
+        norm_new = self.normalize_vendor_name(new_vendor)
+        norm_existing = self.normalize_vendor_name(existing_vendor)
+
+        token_set_ratio = fuzz.token_set_ratio(norm_new, norm_existing)
+
+        final_score = self._weighted_score(
+            token_set_ratio,
+            frozenset(norm_new.split()),
+            frozenset(norm_existing.split())
+        )
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Similarity scores for '{new_vendor}' vs '{existing_vendor}': "
+                         f"token_set_ratio={token_set_ratio}%, final={final_score}%")
+
         return final_score
     
     async def verify_with_openai(self, new_vendor: str, existing_vendor: str) -> bool:
         """Use OpenAI to verify if vendors are similar."""
-        print(f"\nVerifying vendors with OpenAI:")
-        print(f"New vendor: {new_vendor}")
-        print(f"Existing vendor: {existing_vendor}")
+        logger.debug(f"Verifying vendors with OpenAI: '{new_vendor}' vs '{existing_vendor}'")
         
         prompt = f"""
         Are these two vendor names referring to the same business?
@@ -97,7 +273,7 @@ class VendorMatcher:
         """
         
         try:
-            response = openai_client.chat.completions.create(
+            response = await openai_client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": "You are a vendor name matching expert. Respond only with 'true' or 'false'."},
@@ -106,73 +282,194 @@ class VendorMatcher:
                 temperature=0
             )
             result = response.choices[0].message.content.strip().lower() == 'true'
-            print(f"OpenAI verification result: {result}")
+            logger.debug(f"OpenAI verification result: {result}")
             return result
         except Exception as e:
-            print(f"OpenAI API error: {str(e)}")
+            logger.error(f"OpenAI API error: {str(e)}")
             return False
     
+    def _embedding_verify_batch(self, new_vendor: str, candidate_names: List[str]) -> Optional[List[bool]]:
+        """Verify candidates by embedding cosine similarity, one encode call
+        for the whole batch. Returns None when the local model is unavailable."""
+        model = _get_embedding_model()
+        if model is None:
+            return None
+        try:
+            embeddings = model.encode([new_vendor] + candidate_names, normalize_embeddings=True)
+        except Exception as e:
+            # Encode failures also degrade to OpenAI rather than failing
+            # the whole receipt
+            logger.warning(f"Local embedding verification failed ({e}), using OpenAI verification")
+            return None
+        return [
+            float(embeddings[0] @ embedding) > EMBEDDING_SIMILARITY_THRESHOLD
+            for embedding in embeddings[1:]
+        ]
+
+    async def _verify_candidates(self, new_vendor: str, candidate_names: List[str]) -> List[bool]:
+        """Verify borderline candidates, preferring the local embedding model
+        over OpenAI round-trips when it is installed."""
+        results = await asyncio.to_thread(self._embedding_verify_batch, new_vendor, candidate_names)
+        if results is not None:
+            logger.debug(f"Verified {len(candidate_names)} candidate(s) with local embeddings")
+            return results
+        logger.debug(f"Verifying {len(candidate_names)} candidate(s) with OpenAI...")
+        return list(await asyncio.gather(
+            *(self.verify_with_openai(new_vendor, name) for name in candidate_names)
+        ))
+
     async def find_matching_vendor(self, new_vendor: str, existing_vendors: List[Dict]) -> Optional[Dict]:
         """
         Find matching vendor using hybrid approach.
         Returns the matching vendor dict if found, None otherwise.
         """
-        print(f"\nFinding match for vendor: {new_vendor}")
-        print(f"Number of existing vendors to check: {len(existing_vendors)}")
-        
+        logger.debug(f"Finding match for vendor '{new_vendor}' against {len(existing_vendors)} existing vendors")
+
         best_match = None
         best_score = 0
-        
-        for vendor in existing_vendors:
-            print(f"\nChecking against existing vendor: {vendor['name']}")
-            score = self.calculate_similarity_score(new_vendor, vendor['name'])
-            
-            if score > best_score:
-                best_score = score
-                best_match = vendor
-        
+        candidates = []
+
+        norm_new = self.normalize_vendor_name(new_vendor)
+        new_tokens = frozenset(norm_new.split())
+
+        # Make sure every record carries its precomputed normalized form
+        self.prepare_vendors(existing_vendors)
+
+        # Exact hash lookups first: the dominant "same vendor again" case
+        # costs one dict access instead of an O(N) fuzzy sweep
+        if norm_new:
+            exact_match = self._norm_index.get(norm_new)
+            if exact_match is not None:
+                logger.debug(f"Exact normalized match: {exact_match['name']}")
+                return exact_match
+            word_match = self._words_index.get(new_tokens)
+            if word_match is not None:
+                logger.debug(f"Exact word-set match: {word_match['name']}")
+                return word_match
+
+        # Narrow the sweep to vendors sharing at least one word with the
+        # new name - any vendor outside this pool has zero token overlap
+        # and could never pass the Jaccard prefilter
+        if new_tokens:
+            candidate_pool: Dict[str, Dict] = {}
+            for word in new_tokens:
+                for vendor in self._word_index.get(word, ()):
+                    candidate_pool[vendor['id']] = vendor
+            pool = list(candidate_pool.values())
+        else:
+            pool = existing_vendors
+
+        # Jaccard prefilter: skip vendors sharing too few tokens before
+        # paying for the full fuzzy score
+        filtered = []
+        filtered_norms = []
+        for vendor in pool:
+            union = new_tokens | vendor['_words']
+            if union and len(new_tokens & vendor['_words']) / len(union) < JACCARD_PREFILTER_THRESHOLD:
+                continue
+            filtered.append(vendor)
+            filtered_norms.append(vendor['_norm'])
+
+        if filtered:
+            # One vectorized C++ pass over all surviving candidates instead
+            # of a Python-level call per pair
+            ratios = process.cdist(
+                [norm_new], filtered_norms,
+                scorer=fuzz.token_set_ratio, workers=-1
+            )[0]
+
+            # Full weighted score (word overlap + store-variation bonus)
+            # only for the strongest candidates
+            top_indices = sorted(
+                range(len(filtered)), key=lambda i: ratios[i], reverse=True
+            )[:TOP_K_FULL_SCORE]
+
+            for i in top_indices:
+                vendor = filtered[i]
+                score = self._weighted_score(
+                    ratios[i],
+                    new_tokens,
+                    vendor['_words']
+                )
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Scored existing vendor '{vendor['name']}': {score}%")
+
+                if score > best_score:
+                    best_score = score
+                    best_match = vendor
+
+                # OpenAI verification candidates: score between 65 and 80
+                if 65 <= score <= 80:
+                    candidates.append((vendor, score))
+
         if best_match:
-            print(f"\nBest match found: {best_match['name']} with score {best_score}%")
-            
+            logger.info(f"Best match found: {best_match['name']} with score {best_score}%")
+
             # Direct match if score > 80 (increased from 60)
             if best_score > 80:
-                print(f"Found direct match with score {best_score}%")
+                logger.debug(f"Found direct match with score {best_score}%")
                 return best_match
-            
-            # OpenAI verification if score between 65 and 80 (adjusted range)
-            if 65 <= best_score <= 80:
-                print(f"Score {best_score}% is in verification range (65-80)")
-                cache_key = f"{new_vendor}|||{best_match['name']}"
-                
-                # Check cache first
-                if cache_key in self.similarity_cache:
-                    print(f"Found cached result: {self.similarity_cache[cache_key]}")
-                    if self.similarity_cache[cache_key]:
-                        return best_match
-                    return None
-                
-                # Verify with OpenAI
-                print("No cached result, verifying with OpenAI...")
-                is_similar = await self.verify_with_openai(new_vendor, best_match['name'])
-                self.similarity_cache[cache_key] = is_similar
-                
-                if is_similar:
-                    print("OpenAI confirmed match")
-                    return best_match
-                else:
-                    print("OpenAI rejected match")
-        
-        print("No matching vendor found")
+
+        if candidates:
+            # Strongest candidates win ties, so verify in score order
+            candidates.sort(key=lambda pair: pair[1], reverse=True)
+            logger.debug(f"{len(candidates)} candidate(s) in verification range (65-80)")
+
+            # Check the cache before paying for any OpenAI round-trips
+            cache_keys = [self._similarity_cache_key(new_vendor, vendor['name']) for vendor, _ in candidates]
+            cached_results = [await self._get_cached_verification(key) for key in cache_keys]
+
+            for (vendor, score), cached_result in zip(candidates, cached_results):
+                if cached_result:
+                    logger.debug(f"Found cached match: {vendor['name']} ({score}%)")
+                    return vendor
+
+            # Verify all uncached candidates in one shot - a single local
+            # embedding batch when the model is installed, otherwise one
+            # concurrent burst of OpenAI round-trips
+            uncached = [
+                (vendor, key)
+                for (vendor, _), key, cached_result in zip(candidates, cache_keys, cached_results)
+                if cached_result is None
+            ]
+            if uncached:
+                results = await self._verify_candidates(
+                    new_vendor, [vendor['name'] for vendor, _ in uncached]
+                )
+                for (vendor, key), is_similar in zip(uncached, results):
+                    await self._set_cached_verification(key, is_similar)
+                for (vendor, _), is_similar in zip(uncached, results):
+                    if is_similar:
+                        logger.debug(f"Verification confirmed match: {vendor['name']}")
+                        return vendor
+                logger.debug("Verification rejected all candidates")
+
+        logger.debug("No matching vendor found")
         return None
 
 class DatabaseService:
     def __init__(self):
         self.vendor_matcher = VendorMatcher()
-    
-    def _set_auth_token(self, access_token: str):
-        """Set the authentication token for Supabase client."""
-        supabase.postgrest.auth(access_token)
-    
+        # Per-token caches: every query runs under the caller's RLS
+        # policies, so the rows one user sees must never be served to
+        # another. Keying by access token scopes each cache entry to the
+        # user (a refreshed token just refetches) while still saving the
+        # per-transaction round-trips within a session.
+        # access_token -> {category name: id}
+        self._category_maps: LRUCache = LRUCache(maxsize=128)
+        # access_token -> list of vendor records, appended to on insert
+        # instead of refetching the whole table per transaction
+        self._vendor_caches: LRUCache = LRUCache(maxsize=128)
+
+    def _table(self, name: str, access_token: str):
+        """Query builder for a table, authenticated as the calling user.
+
+        Goes through a per-token client rather than mutating auth state
+        on a shared one - see _authed_postgrest.
+        """
+        return _authed_postgrest(access_token).from_(name)
+
+
     def _handle_supabase_error(self, e: Exception) -> None:
         """Handle Supabase-specific errors."""
         error_msg = str(e)
@@ -201,76 +498,114 @@ class DatabaseService:
             raise ValueError("Vendor name cannot be empty")
             
         try:
-            # Set authentication token
-            self._set_auth_token(access_token)
-            
-            # Get all existing vendors
-            response = supabase.table('vendors').select('id, name').execute()
-            existing_vendors = response.data if response.data else []
-            
+            # Get all existing vendors (cached after the first call).
+            # supabase-py is synchronous, so run the fetch in a worker
+            # thread instead of blocking the event loop.
+            existing_vendors = await asyncio.to_thread(self._load_vendors, access_token)
+
             # If we have existing vendors, try to find a match
             if existing_vendors:
                 matched_vendor = await self.vendor_matcher.find_matching_vendor(
                     vendor_name,
                     existing_vendors
                 )
-                
+
                 if matched_vendor:
                     return matched_vendor['id']
-            
-            # If no match found or no existing vendors, create a new vendor
+
+            # If no match found or no existing vendors, create a new vendor.
+            # Upsert on the unique name so two concurrent uploads of the same
+            # vendor resolve to one row in a single round-trip instead of
+            # racing a select-then-insert. created_at is left to the column
+            # default: the conflict path is DO UPDATE with this payload, so
+            # including a timestamp would rewrite the original row's
+            # created_at whenever another worker already inserted the vendor.
             new_vendor = {
-                'name': vendor_name,
-                'created_at': datetime.utcnow().isoformat()
+                'name': vendor_name
             }
-            
+
             try:
-                response = supabase.table('vendors').insert(new_vendor).execute()
+                response = await asyncio.to_thread(
+                    self._table('vendors', access_token).upsert(
+                        new_vendor,
+                        on_conflict='name'
+                    ).execute
+                )
                 if not response.data:
                     raise ValueError("Failed to create new vendor")
-                return response.data[0]['id']
+                created = response.data[0]
+                # Append to the cache instead of refetching the table
+                self._remember_vendor(
+                    {'id': created['id'], 'name': created.get('name', vendor_name)},
+                    access_token
+                )
+                return created['id']
             except Exception as e:
                 self._handle_supabase_error(e)
-            
+
         except Exception as e:
-            print(f"Error in _get_vendor_id: {str(e)}")
+            logger.error(f"Error in _get_vendor_id: {str(e)}")
             raise
     
+    def _load_vendors(self, access_token: str) -> List[Dict]:
+        """Load the vendors visible to this user into their cache entry."""
+        vendors = self._vendor_caches.get(access_token)
+        if vendors is None:
+            response = self._table('vendors', access_token).select('id, name').execute()
+            vendors = response.data if response.data else []
+            # Normalize once at fetch time rather than per comparison
+            self.vendor_matcher.prepare_vendors(vendors)
+            self._vendor_caches[access_token] = vendors
+        return vendors
+
+    def _remember_vendor(self, vendor: Dict, access_token: str) -> None:
+        """Add a newly created vendor to the user's cache without a refetch."""
+        vendors = self._vendor_caches.get(access_token)
+        if vendors is None:
+            return
+        self.vendor_matcher.prepare_vendors([vendor])
+        if all(existing['id'] != vendor['id'] for existing in vendors):
+            vendors.append(vendor)
+
+    def _load_category_map(self, access_token: str) -> Dict[str, str]:
+        """Load the categories visible to this user into their cache entry."""
+        category_map = self._category_maps.get(access_token)
+        if category_map is None:
+            response = self._table('categories', access_token).select('id, name').execute()
+            if not response.data:
+                raise ValueError("Could not load categories")
+            category_map = {row['name']: row['id'] for row in response.data}
+            self._category_maps[access_token] = category_map
+        return category_map
+
     def get_category_id(self, category_name: str, access_token: str) -> str:
         """Get category ID from category name."""
         try:
-            # Set authentication token
-            self._set_auth_token(access_token)
-            
+            category_map = self._load_category_map(access_token)
+
             # First try to find exact match
-            response = supabase.table('categories').select('id').eq('name', category_name).execute()
-            
-            if response.data:
-                return response.data[0]['id']
-            
+            if category_name in category_map:
+                return category_map[category_name]
+
             # If no exact match, try case-insensitive match
-            response = supabase.table('categories').select('id').ilike('name', category_name).execute()
-            
-            if response.data:
-                return response.data[0]['id']
-            
-            # If still no match, get ID for 'Uncategorized'
-            response = supabase.table('categories').select('id').eq('name', 'Uncategorized').execute()
-            if not response.data:
+            lowered = category_name.lower()
+            for name, category_id in category_map.items():
+                if name.lower() == lowered:
+                    return category_id
+
+            # If still no match, fall back to 'Uncategorized'
+            if 'Uncategorized' not in category_map:
                 raise ValueError("Could not find 'Uncategorized' category")
-                
-            return response.data[0]['id']
-            
+
+            return category_map['Uncategorized']
+
         except Exception as e:
-            print(f"Error in get_category_id: {str(e)}")
+            logger.error(f"Error in get_category_id: {str(e)}")
             self._handle_supabase_error(e)
     
     async def store_transaction(self, user_id: str, transaction_data: Dict, access_token: str) -> Dict:
         """Store transaction in database with proper relationships."""
         try:
-            # Set authentication token
-            self._set_auth_token(access_token)
-            
             # Validate required fields
             required_fields = ['vendor', 'date', 'total', 'sector', 'currency']
             missing_fields = [field for field in required_fields if field not in transaction_data]
@@ -280,8 +615,10 @@ class DatabaseService:
             # Get or create vendor
             vendor_id = await self._get_vendor_id(transaction_data['vendor'], access_token)
             
-            # Get category ID
-            category_id = self.get_category_id(transaction_data['sector'], access_token)
+            # Get category ID (first call hits Supabase, so keep it off the event loop)
+            category_id = await asyncio.to_thread(
+                self.get_category_id, transaction_data['sector'], access_token
+            )
             
             # Prepare transaction data
             new_transaction = {
@@ -291,14 +628,16 @@ class DatabaseService:
                 'date': transaction_data['date'],
                 'currency': transaction_data['currency'],
                 'total_amount': float(transaction_data['total']),  # Ensure numeric
-                'raw_data': format_json_for_logging(transaction_data),  # Store only the parsed data
+                'raw_data': orjson.dumps(transaction_data).decode(),  # Store only the parsed data; orjson formats datetimes natively
                 'receipt_url': None,  # Will be updated later when cloud storage is implemented
-                'created_at': datetime.utcnow().isoformat()
+                'created_at': _utc_now_iso()
             }
             
             try:
-                # Insert transaction
-                response = supabase.table('transactions').insert(new_transaction).execute()
+                # Insert transaction without blocking the event loop
+                response = await asyncio.to_thread(
+                    self._table('transactions', access_token).insert(new_transaction).execute
+                )
                 if not response.data:
                     raise ValueError("Failed to create transaction")
                 return response.data[0]
@@ -306,5 +645,5 @@ class DatabaseService:
                 self._handle_supabase_error(e)
             
         except Exception as e:
-            print(f"Error in store_transaction: {str(e)}")
+            logger.error(f"Error in store_transaction: {str(e)}")
             raise 
\ No newline at end of file
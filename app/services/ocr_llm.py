@@ -1,23 +1,12 @@
-import os
+import asyncio
 import json
 from typing import Dict, List
-from openai import OpenAI
 from pydantic import BaseModel
-from paddleocr import PaddleOCR
-import tempfile
-from PIL import Image
-import io
-import base64
 from .base_processor import BaseProcessor, BaseTransactionData, SECTORS
 
-# Initialize the OpenAI client
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    base_url="https://api.openai.com/v1"
-)
-
-# Initialize PaddleOCR
-ocr = PaddleOCR(use_angle_cls=True, lang='en')
+# The OpenAI client and the PaddleOCR engine are shared singletons in
+# base_processor - constructing a second OCR instance here would load a
+# duplicate set of model weights (~200 MiB) for nothing.
 
 # Define what a receipt looks like
 class ReceiptData(BaseModel):
@@ -43,12 +32,12 @@ def calculate_token_usage(response) -> Dict:
 class ReceiptProcessor(BaseProcessor):
     """Processor for receipt images."""
     
-    def process_receipt(self, base64_image: str) -> dict:
+    async def process_receipt(self, image_bytes: bytes) -> dict:
         """
         Process a receipt image using OCR and LLM analysis.
         
         Args:
-            base64_image: Base64 encoded image data
+            image_bytes: Raw (JPEG-compressed) image data
             
         Returns:
             Dict containing both parsed receipt data and raw outputs
@@ -57,7 +46,7 @@ class ReceiptProcessor(BaseProcessor):
             ValueError: If processing fails
         """
         # Use the base processor's process_image method with receipt type
-        result = self.process_image(base64_image, "receipt")
+        result = await self.process_image(image_bytes, "receipt")
         
         # Add receipt-specific data if needed
         result['parsed_data']['transaction_type'] = "receipt"
@@ -67,6 +56,12 @@ class ReceiptProcessor(BaseProcessor):
 # Create a singleton instance
 receipt_processor = ReceiptProcessor()
 
-def ocr_llm_process_receipt(base64_image: str) -> dict:
+async def ocr_llm_process_receipt(image_bytes: bytes) -> dict:
     """Wrapper function to maintain backward compatibility."""
-    return receipt_processor.process_receipt(base64_image) 
\ No newline at end of file
+    return await receipt_processor.process_receipt(image_bytes)
+
+async def ocr_llm_process_receipts(images: list[bytes]) -> list[dict]:
+    """Process several receipts concurrently."""
+    return await asyncio.gather(
+        *(receipt_processor.process_receipt(image_bytes) for image_bytes in images)
+    )
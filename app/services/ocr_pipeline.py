@@ -0,0 +1,90 @@
+import asyncio
+from typing import Callable, List, Optional, Tuple
+
+# Batch fires as soon as this many requests are queued...
+MAX_BATCH_SIZE = 8
+
+# ...or after this long, whichever comes first, so a lone request still
+# gets a prompt answer
+MAX_WAIT_TIME = 0.1
+
+
+class AsyncBatchQueue:
+    """
+    Dynamic mini-batching queue for OCR requests.
+
+    Single-image requests arriving close together under concurrent HTTP
+    load are coalesced into one batched PaddleOCR call instead of
+    serializing on the predictor one image at a time. A background task
+    drains the queue and fires a batch when MAX_BATCH_SIZE items are
+    waiting or MAX_WAIT_TIME has elapsed; each caller just awaits
+    submit() and receives its own result or exception.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[bytes]], List[str]],
+                 max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait_time: float = MAX_WAIT_TIME):
+        self._batch_fn = batch_fn
+        self._max_batch_size = max_batch_size
+        self._max_wait_time = max_wait_time
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    def _ensure_worker(self) -> None:
+        """Start the background drain task on first use.
+
+        Lazy so the queue can be constructed at import time, before any
+        event loop exists.
+        """
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._process_loop())
+
+    async def submit(self, image_bytes: bytes) -> str:
+        """Queue one image for OCR and wait for its extracted text."""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image_bytes, future))
+        return await future
+
+    async def _collect_batch(self) -> List[Tuple[bytes, asyncio.Future]]:
+        """Block for the first item, then coalesce whatever arrives within
+        the wait window up to the batch-size cap."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self._max_wait_time
+        while len(batch) < self._max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _process_loop(self) -> None:
+        """Drain the queue forever, one batched OCR call at a time."""
+        while True:
+            batch = await self._collect_batch()
+            images = [image_bytes for image_bytes, _ in batch]
+            try:
+                # CPU-bound PaddleOCR work runs off the event loop, so the
+                # server keeps accepting (and queueing) requests meanwhile
+                texts = await asyncio.to_thread(self._batch_fn, images)
+            except asyncio.CancelledError:
+                raise
+            except BaseException as e:
+                # BaseException on purpose: PaddleOCR bails out of bad
+                # input via exit() (SystemExit), and letting that kill
+                # the worker would strand every pending future forever.
+                # Rewrap non-Exception escapes so callers' except Exception
+                # handlers still see them.
+                if not isinstance(e, Exception):
+                    e = RuntimeError(f"OCR batch failed: {e!r}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), text in zip(batch, texts):
+                if not future.done():
+                    future.set_result(text)
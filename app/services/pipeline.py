@@ -0,0 +1,135 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from .base_processor import BaseProcessor
+from .database_service import DatabaseService
+
+# Bounded queues keep a slow stage from piling work up in memory
+QUEUE_SIZE = 8
+
+# How many images share one batched PaddleOCR call
+OCR_BATCH_SIZE = 4
+
+# How many LLM requests the middle stage issues concurrently
+LLM_BATCH_SIZE = 4
+
+# How long the LLM stage waits to coalesce queued items into one batch
+LLM_BATCH_WAIT = 0.05
+
+
+class ReceiptPipeline:
+    """
+    Three-stage pipeline for processing batches of receipts.
+
+    OCR, LLM, and database storage run as concurrent stages connected by
+    bounded asyncio.Queues, so while receipt k is being OCR'd, receipt k-1
+    is in the LLM and receipt k-2 is being written to the database. The
+    LLM stage additionally coalesces queued items and issues them
+    concurrently, since each call is dominated by network latency.
+    """
+
+    def __init__(self, processor: BaseProcessor, db_service: DatabaseService, prompt_type: str):
+        self.processor = processor
+        self.db_service = db_service
+        self.prompt_type = prompt_type
+
+    async def _ocr_stage(self, images: List[bytes], llm_queue: asyncio.Queue):
+        """Stage A: extract text through the shared OCR batch queue.
+
+        Submitting a group concurrently lets the queue coalesce it into
+        one batched call, while keeping every OCR invocation - single
+        uploads included - on the queue's lone worker, since the Paddle
+        predictors are not safe to drive from two threads at once.
+        """
+        for start in range(0, len(images), OCR_BATCH_SIZE):
+            batch = images[start:start + OCR_BATCH_SIZE]
+            extracted_texts = await asyncio.gather(
+                *(self.processor._ocr_queue.submit(image_bytes) for image_bytes in batch),
+                return_exceptions=True
+            )
+            for offset, extracted_text in enumerate(extracted_texts):
+                if isinstance(extracted_text, Exception):
+                    await llm_queue.put((start + offset, None, extracted_text))
+                else:
+                    await llm_queue.put((start + offset, extracted_text, None))
+        await llm_queue.put(None)
+
+    async def _llm_stage(self, llm_queue: asyncio.Queue, db_queue: asyncio.Queue):
+        """Stage B: analyze extracted text with the LLM, micro-batching concurrent calls."""
+        done = False
+        while not done:
+            # Drain up to LLM_BATCH_SIZE items, waiting briefly so items
+            # arriving close together share one concurrent batch
+            batch = [await llm_queue.get()]
+            while len(batch) < LLM_BATCH_SIZE:
+                try:
+                    batch.append(await asyncio.wait_for(llm_queue.get(), timeout=LLM_BATCH_WAIT))
+                except asyncio.TimeoutError:
+                    break
+            if batch[-1] is None:
+                done = True
+                batch.pop()
+            if not batch:
+                break
+
+            async def analyze(item):
+                index, extracted_text, error = item
+                if error is not None:
+                    return index, None, error
+                try:
+                    result = await self.processor.analyze_text(extracted_text, self.prompt_type)
+                    return index, result, None
+                except Exception as e:
+                    return index, None, e
+
+            results = await asyncio.gather(*(analyze(item) for item in batch))
+            for result in results:
+                await db_queue.put(result)
+        await db_queue.put(None)
+
+    async def _db_stage(self, db_queue: asyncio.Queue, user_id: str, access_token: str,
+                        results: List[Optional[Dict]]):
+        """Stage C: store each parsed transaction in the database."""
+        while True:
+            item = await db_queue.get()
+            if item is None:
+                break
+            index, result, error = item
+            if error is not None:
+                results[index] = {"error": str(error)}
+                continue
+            try:
+                stored_transaction = await self.db_service.store_transaction(
+                    user_id=user_id,
+                    transaction_data=result['parsed_data'],
+                    access_token=access_token
+                )
+                result['transaction_id'] = stored_transaction['id']
+                results[index] = result
+            except Exception as e:
+                results[index] = {"error": str(e)}
+
+    async def process_batch(self, images: List[bytes], user_id: str, access_token: str) -> List[Dict]:
+        """
+        Process a batch of images through all three stages.
+
+        Args:
+            images: Raw (JPEG-compressed) image data, one entry per receipt
+            user_id: The owning user's id
+            access_token: The user's access token for database writes
+
+        Returns:
+            One result dict per input image, in input order. Failed items
+            carry an "error" key instead of parsed data.
+        """
+        llm_queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        db_queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        results: List[Optional[Dict]] = [None] * len(images)
+
+        await asyncio.gather(
+            self._ocr_stage(images, llm_queue),
+            self._llm_stage(llm_queue, db_queue),
+            self._db_stage(db_queue, user_id, access_token, results),
+        )
+
+        return results
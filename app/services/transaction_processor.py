@@ -1,23 +1,12 @@
-import os
+import logging
 from typing import Dict
-from openai import OpenAI
 from pydantic import BaseModel
-from paddleocr import PaddleOCR
-import base64
-import tempfile
-from PIL import Image
-import io
-import json
 from .base_processor import BaseProcessor, BaseTransactionData, SECTORS
 
-# Initialize OpenAI client
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    base_url="https://api.openai.com/v1"
-)
+logger = logging.getLogger(__name__)
 
-# Initialize PaddleOCR
-ocr = PaddleOCR(use_angle_cls=True, lang='en')
+# The OpenAI client and the PaddleOCR engine are shared singletons in
+# base_processor - see the note there about batch sizes and memory.
 
 # Define transaction data structure
 class TransactionData(BaseModel):
@@ -34,12 +23,12 @@ class TransactionData(BaseModel):
 class TransactionProcessor(BaseProcessor):
     """Processor for transaction screenshots."""
     
-    def process_transaction(self, base64_image: str) -> dict:
+    async def process_transaction(self, image_bytes: bytes) -> dict:
         """
         Process a transaction screenshot using OCR and LLM analysis.
         
         Args:
-            base64_image: Base64 encoded image data
+            image_bytes: Raw (JPEG-compressed) image data
             
         Returns:
             Dict containing both parsed transaction data and raw outputs
@@ -49,7 +38,7 @@ class TransactionProcessor(BaseProcessor):
         """
         try:
             # Use the base processor's process_image method with transaction type
-            result = self.process_image(base64_image, "transaction")
+            result = await self.process_image(image_bytes, "transaction")
             
             # Ensure the parsed data has all required fields
             if 'parsed_data' in result:
@@ -72,12 +61,12 @@ class TransactionProcessor(BaseProcessor):
             return result
             
         except Exception as e:
-            print(f"Error in process_transaction: {str(e)}")
+            logger.error(f"Error in process_transaction: {str(e)}")
             raise
 
 # Create a singleton instance
 transaction_processor = TransactionProcessor()
 
-def process_transaction_screenshot(base64_image: str) -> dict:
+async def process_transaction_screenshot(image_bytes: bytes) -> dict:
     """Wrapper function to maintain backward compatibility."""
-    return transaction_processor.process_transaction(base64_image) 
\ No newline at end of file
+    return await transaction_processor.process_transaction(image_bytes) 
\ No newline at end of file